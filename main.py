@@ -1,15 +1,27 @@
 #!/usr/bin/env python3
 import asyncio
 import logging
+import queue
 import signal
 import sys
-from pathlib import Path
 
 from mediacenter.config.settings import Settings
-from mediacenter.modules.audio_player import AudioPlayer
-from mediacenter.modules.tts_engine import TTSEngine
-from mediacenter.services.hc3_listener import HC3CommandListener
-from mediacenter.services.webhook_service import WebhookService
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+def _parse_size(size) -> int:
+    """Convert a size such as "10MB", "512K" or 1048576 to bytes"""
+    if isinstance(size, int):
+        return size
+    size = str(size).strip().upper().rstrip('B')
+    if size and size[-1] in SIZE_UNITS:
+        return int(float(size[:-1]) * SIZE_UNITS[size[-1]])
+    return int(size)
 
 class MediaCenterApp:
     def __init__(self):
@@ -19,36 +31,65 @@ class MediaCenterApp:
         self.hc3_listener = None
         self.webhook_service = None
         self.running = False
+        self.stop_event = None
+        self.log_listener = None
         
         # Setup logging
         self._setup_logging()
         
-        # Setup signal handlers
-        signal.signal(signal.SIGINT, self._signal_handler)
-        signal.signal(signal.SIGTERM, self._signal_handler)
-        
     def _setup_logging(self):
         """Setup logging"""
+        from pathlib import Path
+        
         # Create logs directory if it doesn't exist
         log_dir = Path(self.settings.log_file).parent
         log_dir.mkdir(parents=True, exist_ok=True)
         
-        # Configure logging
+        # Configure logging; records are formatted by the QueueHandler and written
+        # by a background QueueListener thread so the event loop never blocks on I/O
+        from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+        
+        log_queue = queue.SimpleQueue()
+        self.log_listener = QueueListener(
+            log_queue,
+            RotatingFileHandler(
+                self.settings.log_file,
+                maxBytes=_parse_size(self.settings.get('logging.max_size', '10MB')),
+                backupCount=self.settings.get('logging.backup_count', 5),
+                encoding='utf-8'
+            ),
+            logging.StreamHandler(sys.stdout)
+        )
         logging.basicConfig(
             level=getattr(logging, self.settings.log_level),
             format=self.settings.get('logging.format'),
-            handlers=[
-                logging.FileHandler(self.settings.log_file, encoding='utf-8'),
-                logging.StreamHandler(sys.stdout)
-            ]
+            handlers=[QueueHandler(log_queue)]
         )
+        self.log_listener.start()
         
         self.logger = logging.getLogger(__name__)
         
-    def _signal_handler(self, signum, frame):
+    def install_signal_handlers(self):
+        """Install stop signal handlers on the running event loop"""
+        loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self._signal_handler, signum)
+            except NotImplementedError:
+                # Windows event loops don't support add_signal_handler
+                signal.signal(
+                    signum,
+                    lambda s, frame: loop.call_soon_threadsafe(self._signal_handler, s)
+                )
+        
+    def _signal_handler(self, signum):
         """Handle stop signal"""
         self.logger.info(f"Received signal {signum}, shutting down...")
         self.running = False
+        if self.stop_event:
+            self.stop_event.set()
         
     async def initialize(self):
         """Initialize components"""
@@ -58,31 +99,47 @@ class MediaCenterApp:
             # Create necessary directories
             self.settings.create_directories()
             
+            # Heavy modules are imported lazily so disabled services cost nothing
+            from mediacenter.modules.audio_player import AudioPlayer
+            
             # Initialize audio player
             self.audio_player = AudioPlayer(
                 music_dir=self.settings.music_dir,
-                playlists_dir=self.settings.playlists_dir
+                playlists_dir=self.settings.playlists_dir,
+                supported_formats=self.settings.get('audio.supported_formats')
             )
             self.audio_player.set_volume(self.settings.default_volume)
             
-            # Initialize TTS engine
-            self.tts_engine = TTSEngine(
-                cache_dir=self.settings.tts_cache_dir,
-                default_voice=self.settings.get('tts.default_voice', 'default')
-            )
+            # Initialize HC3 listener; the webhook dispatches /hc3/command through it
+            # even when the HC3 polling loop itself is disabled
+            from mediacenter.services.hc3_listener import HC3CommandListener
             
-            # Initialize HC3 listener
             self.hc3_listener = HC3CommandListener(
                 audio_player=self.audio_player,
                 settings=self.settings
             )
             
-            # Initialize webhook service
-            self.webhook_service = WebhookService(
-                tts_engine=self.tts_engine,
-                settings=self.settings,
-                hc3_listener=self.hc3_listener
-            )
+            if self.settings.get('webhook.enabled', True):
+                from mediacenter.modules.tts_engine import TTSEngine
+                from mediacenter.services.webhook_service import WebhookService
+                
+                # Initialize TTS engine
+                self.tts_engine = TTSEngine(
+                    cache_dir=self.settings.tts_cache_dir,
+                    default_voice=self.settings.get('tts.default_voice', 'default'),
+                    cache_enabled=self.settings.get('tts.cache_enabled', True),
+                    max_cache_files=self.settings.get('tts.max_cache_files', 1000),
+                    max_cache_bytes=self.settings.get('tts.max_cache_bytes', 500 * 1024 * 1024),
+                    cache_max_age_days=self.settings.get('tts.cache_max_age_days', 30),
+                    gpu_mem_limit=self.settings.get('tts.gpu_mem_limit', 2 * 1024 ** 3)
+                )
+                
+                # Initialize webhook service
+                self.webhook_service = WebhookService(
+                    tts_engine=self.tts_engine,
+                    settings=self.settings,
+                    hc3_listener=self.hc3_listener
+                )
             
             self.logger.info("Media Center initialized successfully")
             
@@ -96,31 +153,48 @@ class MediaCenterApp:
             self.running = True
             self.logger.info("Starting Media Center services...")
             
-            # Create tasks for all services
-            tasks = []
+            # Collect coroutines for all enabled services
+            services = []
             
             # Start webhook service
             if self.settings.get('webhook.enabled', True):
-                webhook_task = asyncio.create_task(
+                services.append(
                     self.webhook_service.start(
                         host=self.settings.webhook_host,
                         port=self.settings.webhook_port
                     )
                 )
-                tasks.append(webhook_task)
                 self.logger.info(f"Webhook service starting on {self.settings.webhook_host}:{self.settings.webhook_port}")
             
             # Start HC3 listener
             if self.settings.get('hc3.enabled', True):
-                hc3_task = asyncio.create_task(self.hc3_listener.start())
-                tasks.append(hc3_task)
+                services.append(self.hc3_listener.start())
                 self.logger.info("HC3 listener service started")
             
-            # Wait for all tasks to complete or error
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
-            else:
+            if not services:
                 self.logger.warning("No services enabled")
+                return
+                
+            if self.stop_event is None:
+                self.stop_event = asyncio.Event()
+                
+            if sys.version_info >= (3, 11):
+                # TaskGroup cancels the other services as soon as one fails
+                async with asyncio.TaskGroup() as tg:
+                    tasks = [tg.create_task(self._run_service(service)) for service in services]
+                    tg.create_task(self._cancel_on_stop(tasks))
+            else:
+                tasks = [asyncio.create_task(self._run_service(service)) for service in services]
+                watcher = asyncio.create_task(self._cancel_on_stop(tasks))
+                try:
+                    results = await asyncio.gather(*tasks, return_exceptions=True)
+                finally:
+                    watcher.cancel()
+                    for task in tasks:
+                        task.cancel()
+                for result in results:
+                    if isinstance(result, Exception):
+                        raise result
                 
         except Exception as e:
             self.logger.error(f"Error starting services: {e}")
@@ -128,6 +202,19 @@ class MediaCenterApp:
         finally:
             await self.stop()
             
+    async def _run_service(self, service):
+        """Run a service, requesting shutdown of the others once it exits"""
+        try:
+            await service
+        finally:
+            self.stop_event.set()
+            
+    async def _cancel_on_stop(self, tasks):
+        """Cancel service tasks once shutdown is requested"""
+        await self.stop_event.wait()
+        for task in tasks:
+            task.cancel()
+            
     async def stop(self):
         """Stop all services"""
         try:
@@ -145,14 +232,22 @@ class MediaCenterApp:
             if self.tts_engine:
                 await self.tts_engine.stop()
                 
+            await self.settings.flush()
+                
             self.logger.info("Media Center stopped successfully")
             
         except Exception as e:
             self.logger.error(f"Error stopping Media Center: {e}")
+        finally:
+            # Flush pending log records
+            if self.log_listener:
+                self.log_listener.stop()
+                self.log_listener = None
 
 async def main():
     """Main function"""
     app = MediaCenterApp()
+    app.install_signal_handlers()
     
     try:
         await app.initialize()
@@ -162,8 +257,17 @@ async def main():
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(1)
+    finally:
+        # stop() never runs when initialize() fails, flush queued log records anyway
+        if app.log_listener:
+            app.log_listener.stop()
+            app.log_listener = None
 
 if __name__ == "__main__":
+    # uvloop (pulled in by uvicorn[standard]) speeds up the webhook server and subprocess handling
+    if uvloop:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
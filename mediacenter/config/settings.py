@@ -1,12 +1,31 @@
 import os
 import json
+import asyncio
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Set
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Directories already created by this process
+_ENSURED: Set[str] = set()
 
 class Settings:
     def __init__(self, config_file: Optional[str] = None):
         self.config_file = config_file or "config.json"
+        # True when config has changes not yet written by save_config()
+        self._dirty = False
         self.config = self._load_config()
+        self._flat: Dict[str, Any] = {}
+        self._flatten(self.config)
+        self._cache_attributes()
+        
+        # Write out the default config on first run
+        if self._dirty:
+            self.save_config()
         
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration from file or create default config"""
@@ -14,15 +33,17 @@ class Settings:
         
         if config_path.exists():
             try:
+                if orjson:
+                    with open(config_path, 'rb') as f:
+                        return orjson.loads(f.read())
                 with open(config_path, 'r', encoding='utf-8') as f:
                     return json.load(f)
             except Exception as e:
                 print(f"Error loading config: {e}")
                 return self._get_default_config()
         else:
-            config = self._get_default_config()
-            self.save_config()
-            return config
+            self._dirty = True
+            return self._get_default_config()
     
     def _get_default_config(self) -> Dict[str, Any]:
         """Default configuration"""
@@ -44,7 +65,12 @@ class Settings:
                 "enabled": True,
                 "host": "0.0.0.0",
                 "port": 8000,
-                "timeout": 60
+                "timeout": 60,
+                "event_url": "",
+                "batch_window_ms": 200,
+                "batch_max": 50,
+                "event_queue_size": 1000,
+                "tts_queue_size": 32
             },
             "tts": {
                 "engine": "espeak",
@@ -52,7 +78,10 @@ class Settings:
                 "default_speed": 1.0,
                 "default_volume": 0.8,
                 "cache_enabled": True,
-                "max_cache_files": 1000
+                "max_cache_files": 1000,
+                "max_cache_bytes": 524288000,
+                "cache_max_age_days": 30,
+                "gpu_mem_limit": 2147483648
             },
             "logging": {
                 "level": "INFO",
@@ -74,26 +103,47 @@ class Settings:
             config_path = Path(self.config_file)
             config_path.parent.mkdir(parents=True, exist_ok=True)
             
-            with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=2, ensure_ascii=False)
+            if orjson:
+                with open(config_path, 'wb') as f:
+                    f.write(orjson.dumps(self.config, option=orjson.OPT_INDENT_2))
+            else:
+                with open(config_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.config, f, indent=2, ensure_ascii=False)
+            self._dirty = False
         except Exception as e:
             print(f"Error saving config: {e}")
     
+    def _flatten(self, d: Dict[str, Any], prefix: str = ''):
+        """Index every nested config value under its dotted key"""
+        if not prefix:
+            self._flat = {}
+            
+        for k, v in d.items():
+            key = f"{prefix}{k}"
+            self._flat[key] = v
+            if isinstance(v, dict):
+                self._flatten(v, f"{key}.")
+    
     def get(self, key: str, default: Any = None) -> Any:
         """Get config value by key (supports nested keys with dots)"""
-        keys = key.split('.')
-        value = self.config
-        
-        for k in keys:
-            if isinstance(value, dict) and k in value:
-                value = value[k]
-            else:
-                return default
-                
-        return value
+        return self._flat.get(key, default)
+    
+    async def flush(self):
+        """Write pending changes to the config file"""
+        if self._dirty:
+            await asyncio.to_thread(self.save_config)
+    
+    @contextmanager
+    def batch(self):
+        """Group several set() calls into a single config file write"""
+        try:
+            yield self
+        finally:
+            if self._dirty:
+                self.save_config()
     
     def set(self, key: str, value: Any):
-        """Set config value by key (supports nested keys with dots)"""
+        """Set config value by key (supports nested keys with dots); call flush() to persist"""
         keys = key.split('.')
         config = self.config
         
@@ -103,52 +153,29 @@ class Settings:
             config = config[k]
             
         config[keys[-1]] = value
-        self.save_config()
-    
-    # Properties for quick access to commonly used configurations
-    @property
-    def music_dir(self) -> str:
-        return self.get('audio.music_dir', './audio/music')
-    
-    @property
-    def playlists_dir(self) -> str:
-        return self.get('audio.playlists_dir', './audio/playlists')
-    
-    @property
-    def tts_cache_dir(self) -> str:
-        return self.get('audio.tts_cache_dir', './audio/tts_cache')
-    
-    @property
-    def webhook_host(self) -> str:
-        return self.get('webhook.host', '0.0.0.0')
-    
-    @property
-    def webhook_port(self) -> int:
-        return self.get('webhook.port', 8000)
-    
-    @property
-    def hc3_host(self) -> str:
-        return self.get('hc3.host', '0.0.0.0')
-    
-    @property
-    def hc3_port(self) -> int:
-        return self.get('hc3.port', 8001)
-    
-    @property
-    def log_level(self) -> str:
-        return self.get('logging.level', 'INFO')
-    
-    @property
-    def log_file(self) -> str:
-        return self.get('logging.file', './logs/mediacenter.log')
-    
-    @property
-    def tts_engine(self) -> str:
-        return self.get('tts.engine', 'espeak')
-    
-    @property
-    def default_volume(self) -> int:
-        return self.get('audio.default_volume', 50)
+        self._flatten(self.config)
+        self._cache_attributes()
+        self._dirty = True
+    
+    # Commonly used configurations, cached as plain attributes by _cache_attributes()
+    CACHED_ATTRIBUTES = {
+        'music_dir': ('audio.music_dir', './audio/music'),
+        'playlists_dir': ('audio.playlists_dir', './audio/playlists'),
+        'tts_cache_dir': ('audio.tts_cache_dir', './audio/tts_cache'),
+        'webhook_host': ('webhook.host', '0.0.0.0'),
+        'webhook_port': ('webhook.port', 8000),
+        'hc3_host': ('hc3.host', '0.0.0.0'),
+        'hc3_port': ('hc3.port', 8001),
+        'log_level': ('logging.level', 'INFO'),
+        'log_file': ('logging.file', './logs/mediacenter.log'),
+        'tts_engine': ('tts.engine', 'espeak'),
+        'default_volume': ('audio.default_volume', 50),
+    }
+    
+    def _cache_attributes(self):
+        """Freeze commonly used configurations into instance attributes"""
+        for attr, (key, default) in self.CACHED_ATTRIBUTES.items():
+            setattr(self, attr, self._flat.get(key, default))
     
     def create_directories(self):
         """Create necessary directories"""
@@ -160,4 +187,7 @@ class Settings:
         ]
         
         for directory in directories:
-            Path(directory).mkdir(parents=True, exist_ok=True)
\ No newline at end of file
+            if not directory or directory in _ENSURED:
+                continue
+            os.makedirs(directory, exist_ok=True)
+            _ENSURED.add(directory)
\ No newline at end of file
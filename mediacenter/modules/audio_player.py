@@ -2,33 +2,60 @@ import asyncio
 import json
 import os
 import random
+import re
 import logging
-from typing import List, Optional, Dict, Any
+from array import array
+from typing import List, Optional, Dict, Any, Tuple
 from pathlib import Path
-import subprocess
-from .youtube_player import YouTubePlayer
+import mpv
+from .youtube_player import YouTubePlayer, is_valid_youtube_url, is_valid_youtube_playlist_url
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+AUDIO_EXTENSIONS = ['.mp3', '.wav', '.flac', '.ogg', '.m4a']
+
 class AudioPlayer:
-    def __init__(self, music_dir: str, playlists_dir: str, youtube_cache_dir: str = "./audio/youtube_cache"):
+    def __init__(self, music_dir: str, playlists_dir: str, youtube_cache_dir: str = "./audio/youtube_cache",
+                 supported_formats: Optional[List[str]] = None):
         self.music_dir = Path(music_dir)
         self.playlists_dir = Path(playlists_dir)
-        self.current_process = None
+        self.supported_formats = {ext.lower() for ext in (supported_formats or AUDIO_EXTENSIONS)}
         self.current_playlist = []
         self.current_index = 0
+        # Play order as indices into current_playlist, shuffled instead of the playlist itself
+        self._order = array('i')
+        # Parsed playlists: {name: (st_mtime_ns, songs)}
+        self._playlist_cache: Dict[str, Tuple[int, List[str]]] = {}
         self.is_playing = False
         self.volume = 50
         self.repeat_mode = False
         self.shuffle_mode = False
         
+        # In-memory index of the music library: {stem and lowercased stem: path}, plus
+        # {lowercased file name: path} for exact lookups only, so partial matches never
+        # hit an extension. Built lazily and rebuilt when the music directory's mtime changes
+        self._song_index: Optional[Dict[str, Path]] = None
+        self._name_index: Dict[str, Path] = {}
+        self._index_mtime = 0.0
+        
+        # Long-lived libmpv instance, reused for every track
+        self._mpv = mpv.MPV(video=False, audio_display=False)
+        # Bumped whenever playback is stopped or replaced, so waiters on an old track bail out
+        self._play_token = 0
+        self._mpv.volume = self.volume
+        
         # YouTube player
         self.youtube_player = YouTubePlayer(youtube_cache_dir)
         
     async def play_song(self, song_name: str):
         """Play a specific song"""
         try:
-            song_path = self._find_song(song_name)
+            song_path = await self._find_song_async(song_name)
             if not song_path:
                 logger.error(f"Song not found: {song_name}")
                 return False
@@ -50,11 +77,13 @@ class AudioPlayer:
                 logger.error(f"Playlist not found: {playlist_name}")
                 return False
                 
+            await self.stop()
             self.current_playlist = playlist
             self.current_index = 0
+            self._order = array('i', range(len(playlist)))
             
             if self.shuffle_mode:
-                random.shuffle(self.current_playlist)
+                self._shuffle_order()
                 
             await self._play_current_song()
             logger.info(f"Playing playlist: {playlist_name}")
@@ -80,6 +109,11 @@ class AudioPlayer:
     async def play_youtube_url(self, url: str, audio_only: bool = True):
         """Play music from YouTube URL"""
         try:
+            # Reject bad URLs before stopping whatever is playing now
+            if not is_valid_youtube_url(url):
+                logger.error(f"Invalid YouTube URL: {url}")
+                return False
+                
             await self.stop()
             success = await self.youtube_player.play_youtube_url(url, audio_only)
             if success:
@@ -93,6 +127,11 @@ class AudioPlayer:
     async def play_youtube_playlist(self, playlist_url: str, audio_only: bool = True, shuffle: bool = False):
         """Play YouTube playlist"""
         try:
+            # Reject bad URLs before stopping whatever is playing now
+            if not is_valid_youtube_playlist_url(playlist_url):
+                logger.error(f"Invalid YouTube playlist URL: {playlist_url}")
+                return False
+                
             await self.stop()
             success = await self.youtube_player.play_youtube_playlist(playlist_url, audio_only, shuffle)
             if success:
@@ -106,14 +145,12 @@ class AudioPlayer:
     async def stop(self):
         """Stop playing music"""
         # Stop local player
-        if self.current_process:
+        self._play_token += 1
+        if not self._mpv.idle_active:
             try:
-                self.current_process.terminate()
-                await asyncio.sleep(0.5)
-                if self.current_process.poll() is None:
-                    self.current_process.kill()
-                self.current_process = None
                 self.is_playing = False
+                self._mpv.pause = False
+                self._mpv.stop()
                 logger.info("Music stopped")
             except Exception as e:
                 logger.error(f"Error stopping music: {e}")
@@ -124,9 +161,9 @@ class AudioPlayer:
     
     async def pause(self):
         """Pause music playback"""
-        if self.current_process and self.is_playing:
+        if not self._mpv.idle_active and self.is_playing:
             try:
-                self.current_process.send_signal(subprocess.signal.SIGSTOP)
+                self._mpv.pause = True
                 self.is_playing = False
                 logger.info("Music paused")
             except Exception as e:
@@ -134,9 +171,9 @@ class AudioPlayer:
     
     async def resume(self):
         """Resume music playback"""
-        if self.current_process and not self.is_playing:
+        if not self._mpv.idle_active and not self.is_playing:
             try:
-                self.current_process.send_signal(subprocess.signal.SIGCONT)
+                self._mpv.pause = False
                 self.is_playing = True
                 logger.info("Music resumed")
             except Exception as e:
@@ -144,36 +181,79 @@ class AudioPlayer:
     
     async def next_song(self):
         """Skip to next song"""
-        if self.current_playlist:
-            self.current_index = (self.current_index + 1) % len(self.current_playlist)
+        playlist_length = len(self.current_playlist)
+        if playlist_length:
+            self.current_index = (self.current_index + 1) % playlist_length
+            if self.current_index == 0 and self.shuffle_mode:
+                self._reshuffle_cycle()
             await self._play_current_song()
     
     async def previous_song(self):
         """Go back to previous song"""
-        if self.current_playlist:
-            self.current_index = (self.current_index - 1) % len(self.current_playlist)
+        playlist_length = len(self.current_playlist)
+        if playlist_length:
+            self.current_index = (self.current_index - 1) % playlist_length
             await self._play_current_song()
     
-    async def set_volume(self, volume: int):
+    def set_volume(self, volume: int):
         """Adjust volume (0-100)"""
         self.volume = max(0, min(100, volume))
+        self._mpv.volume = self.volume
         logger.info(f"Volume set to: {self.volume}")
     
-    def toggle_shuffle(self):
-        """Toggle shuffle mode"""
+    def toggle_shuffle(self, shuffle_rest: bool = False):
+        """Toggle shuffle mode; with shuffle_rest only the songs after the current one are shuffled"""
         self.shuffle_mode = not self.shuffle_mode
+        
+        if self._order:
+            if self.shuffle_mode and shuffle_rest:
+                # Keep the play history and current song in place
+                self._shuffle_order(self.current_index + 1)
+            else:
+                # Reorder the playlist, keeping the current song's position
+                current = self._order[self.current_index]
+                if self.shuffle_mode:
+                    self._shuffle_order()
+                else:
+                    self._order = array('i', range(len(self.current_playlist)))
+                self.current_index = self._order.index(current)
+            
         logger.info(f"Shuffle mode: {'ON' if self.shuffle_mode else 'OFF'}")
     
+    def _shuffle_order(self, start: int = 0):
+        """Fisher-Yates shuffle of the play order from start onwards, in place"""
+        order = self._order
+        randrange = random.randrange
+        for i in range(len(order) - 1, start, -1):
+            j = randrange(start, i + 1)
+            order[i], order[j] = order[j], order[i]
+    
+    def _reshuffle_cycle(self):
+        """Draw a fresh order once every song of a shuffled cycle has played"""
+        last = self._order[-1]
+        self._shuffle_order()
+        
+        # Don't play the same song twice in a row across cycles
+        if len(self._order) > 1 and self._order[0] == last:
+            j = random.randrange(1, len(self._order))
+            self._order[0], self._order[j] = self._order[j], self._order[0]
+    
     def toggle_repeat(self):
         """Toggle repeat mode"""
         self.repeat_mode = not self.repeat_mode
         logger.info(f"Repeat mode: {'ON' if self.repeat_mode else 'OFF'}")
     
+    async def refresh_library(self):
+        """Re-scan the music directory after files were added or removed"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._rebuild_index)
+        logger.info(f"Music library refreshed: {len(self._name_index)} files")
+    
     def get_status(self) -> Dict[str, Any]:
         """Get current player status"""
         current_song = None
         if self.current_playlist and 0 <= self.current_index < len(self.current_playlist):
-            current_song = self.current_playlist[self.current_index]
+            current_song = self.current_playlist[self._order[self.current_index]]
             
         return {
             "is_playing": self.is_playing,
@@ -185,56 +265,119 @@ class AudioPlayer:
             "current_index": self.current_index
         }
     
+    def _rebuild_index(self):
+        """Index music files by name with a single recursive scandir walk"""
+        try:
+            self._index_mtime = self.music_dir.stat().st_mtime
+        except FileNotFoundError:
+            self._index_mtime = 0.0
+            
+        files = []
+        pending = [str(self.music_dir)]
+        supported_formats = self.supported_formats
+        splitext = os.path.splitext
+        while pending:
+            try:
+                with os.scandir(pending.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir():
+                            pending.append(entry.path)
+                        elif entry.is_file() and splitext(entry.name)[1].lower() in supported_formats:
+                            files.append(entry.path)
+            except OSError:
+                continue
+                
+        index = {}
+        names = {}
+        for path in sorted(files):
+            file_path = Path(path)
+            index.setdefault(file_path.stem, file_path)
+            index.setdefault(file_path.stem.lower(), file_path)
+            names.setdefault(file_path.name.lower(), file_path)
+        self._name_index = names
+        self._song_index = index
+    
+    def _get_song_index(self) -> Dict[str, Path]:
+        """Return the song index, rebuilding it if the music directory changed"""
+        try:
+            mtime = self.music_dir.stat().st_mtime
+        except FileNotFoundError:
+            mtime = 0.0
+        if self._song_index is None or mtime != self._index_mtime:
+            self._rebuild_index()
+        return self._song_index
+    
+    async def _find_song_async(self, song_name: str) -> Optional[Path]:
+        """Find music file by name in a worker thread, an index rebuild walks the whole library"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._find_song, song_name)
+    
     def _find_song(self, song_name: str) -> Optional[Path]:
         """Find music file by name"""
-        for ext in ['.mp3', '.wav', '.flac', '.ogg', '.m4a']:
-            song_path = self.music_dir / f"{song_name}{ext}"
-            if song_path.exists():
-                return song_path
+        song_index = self._get_song_index()
+        song_path = (song_index.get(song_name) or song_index.get(song_name.lower())
+                     or self._name_index.get(song_name.lower()))
+        if song_path:
+            return song_path
                 
-        # Case-insensitive search
-        for file_path in self.music_dir.rglob("*"):
-            if file_path.is_file() and song_name.lower() in file_path.stem.lower():
+        # Case-insensitive partial match on stems only
+        needle = re.compile(re.escape(song_name), re.IGNORECASE)
+        for stem, file_path in song_index.items():
+            if needle.search(stem):
                 return file_path
                 
         return None
     
     def _load_playlist(self, playlist_name: str) -> List[str]:
-        """Load playlist from JSON file"""
+        """Load playlist from JSON file, reusing the parsed copy while the file is unchanged"""
         playlist_path = self.playlists_dir / f"{playlist_name}.json"
-        if not playlist_path.exists():
+        try:
+            mtime = playlist_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._playlist_cache.pop(playlist_name, None)
             return []
             
+        cached = self._playlist_cache.get(playlist_name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+            
         try:
-            with open(playlist_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('songs', [])
+            if orjson:
+                data = orjson.loads(playlist_path.read_bytes())
+            else:
+                with open(playlist_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            songs = data.get('songs', [])
+            self._playlist_cache[playlist_name] = (mtime, songs)
+            return songs
         except Exception as e:
             logger.error(f"Error loading playlist {playlist_name}: {e}")
             return []
     
     async def _play_file(self, file_path: Path):
-        """Play music file using mpg123 or aplay"""
+        """Play music file through the persistent mpv instance"""
         try:
-            # Try using mpg123 for MP3
-            if file_path.suffix.lower() == '.mp3':
-                cmd = ['mpg123', '-q', str(file_path)]
-            else:
-                # Use aplay for other formats
-                cmd = ['aplay', str(file_path)]
-                
-            self.current_process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            self.is_playing = True
+            loop = asyncio.get_running_loop()
+            self._play_token += 1
+            token = self._play_token
+            
+            def finished(event):
+                # The replaced track's end event (reason "stopped") must not end this one
+                return token != self._play_token or event.data.reason != mpv.MpvEventEndFile.ABORTED
             
-            # Wait for process to finish
-            await self.current_process.wait()
+            def play_and_wait():
+                # Loading a file replaces the current one in mpv, so no teardown is needed between tracks
+                with self._mpv.prepare_and_wait_for_event('end_file', cond=finished):
+                    # mpv keeps the pause flag across loadfile, so a paused player would load the next track paused
+                    self._mpv.pause = False
+                    self._mpv.play(str(file_path))
+            
+            # Wait for playback to finish without blocking the event loop
+            self.is_playing = True
+            await loop.run_in_executor(None, play_and_wait)
             
             # If playing playlist and song ends naturally
-            if self.is_playing and self.current_playlist:
+            if token == self._play_token and self.is_playing and self.current_playlist:
                 await self._handle_song_finished()
                 
         except Exception as e:
@@ -246,11 +389,12 @@ class AudioPlayer:
         if not self.current_playlist or self.current_index >= len(self.current_playlist):
             return
             
-        song_name = self.current_playlist[self.current_index]
-        song_path = self._find_song(song_name)
+        song_name = self.current_playlist[self._order[self.current_index]]
+        song_path = await self._find_song_async(song_name)
         
         if song_path:
-            await self.stop()
+            # Hand-off skips stop(), so make sure a YouTube stream isn't still playing
+            await self.youtube_player.stop()
             await self._play_file(song_path)
         else:
             logger.error(f"Song not found in playlist: {song_name}")
@@ -265,9 +409,8 @@ class AudioPlayer:
             # Move to next song
             await self.next_song()
         elif self.repeat_mode:
-            # Repeat playlist
-            self.current_index = 0
-            await self._play_current_song()
+            # Repeat playlist, next_song wraps around (and reshuffles in shuffle mode)
+            await self.next_song()
         else:
             # End playlist
             self.is_playing = False
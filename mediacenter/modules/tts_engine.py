@@ -1,19 +1,20 @@
 import asyncio
+import functools
 import hashlib
 import os
 import logging
+import struct
+import time
 from pathlib import Path
-from typing import Optional
-import subprocess
-import tempfile
+from typing import Callable, Dict, Optional, Tuple
 import sys
-import torch
+import threading
+import wave
 import numpy as np
 import onnxruntime as ort
-from scipy.io.wavfile import write
-from pydub import AudioSegment
-import onnx
 import re
+import shutil
+import tempfile
 
 # Add stylish-tts lib to path
 sys.path.append(str(Path(__file__).parent.parent.parent / "stylish-tts" / "lib"))
@@ -26,27 +27,103 @@ from vi_cleaner.vi_cleaner import ViCleaner
 
 logger = logging.getLogger(__name__)
 
+# BLAKE2b key of TTS cache file names; change it to invalidate every cached file
+CACHE_KEY_VERSION = b'tts-v1'
+
+# Run cache eviction after this many newly generated files
+CURATE_EVERY = 10
+
+# Fallback players resolved on PATH once at import; players that aren't installed are skipped
+FALLBACK_PLAYERS = [
+    (name, path) for name, path in ((name, shutil.which(name)) for name in ('mpg123', 'sox', 'paplay'))
+    if path
+]
+
+# Text chunks whose normalized, phonemized tokens are memoized
+TOKEN_CACHE_SIZE = 2048
+
+# Token lengths run once at startup so real requests hit warm kernels and arenas
+WARMUP_LENGTHS = (32, 64, 128, 256)
+
+# CUDA provider tuned for Jetson: heuristic cuDNN algorithm choice instead of an
+# exhaustive search per input shape, and an arena grown only as needed up to the
+# configured tts.gpu_mem_limit
+CUDA_PROVIDER_OPTIONS = {
+    "device_id": 0,
+    "arena_extend_strategy": "kSameAsRequested",
+    "cudnn_conv_algo_search": "HEURISTIC",
+    "do_copy_in_default_stream": True,
+}
+
+# Stylish-TTS output sample rate
+SAMPLE_RATE = 24000
+
+# Seconds of silence after which aplay is closed so it releases the ALSA device for mpv
+PLAYER_IDLE_TIMEOUT = 5.0
+
+# One second of shared silence; pauses up to that long are read-only slices of it
+SILENCE = np.zeros(SAMPLE_RATE, dtype=np.int16)
+SILENCE.flags.writeable = False
+
+# Tone numbers emitted by the G2P mapped to Stylish-TTS tone arrows
+TONE_ARROWS = str.maketrans({
+    "1": "",
+    "2": "↘",
+    "3": "→",
+    "4": "⤺",
+    "5": "↗",
+    "6": "↓",
+})
+
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+PAUSE_SPLIT_RE = re.compile(r'(<pause\s+\d+>)')
+PAUSE_TAG_RE = re.compile(r'<pause\s+(\d+)>')
+
 class TTSEngine:
-    def __init__(self, cache_dir: str, default_voice: str = "default"):
+    def __init__(self, cache_dir: str, default_voice: str = "default",
+                 cache_enabled: bool = True, max_cache_files: int = 1000,
+                 max_cache_bytes: int = 500 * 1024 * 1024, cache_max_age_days: float = 30,
+                 gpu_mem_limit: int = 2 * 1024 ** 3):
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.default_voice = default_voice
+        # Long-lived raw PCM aplay process shared by all utterances
         self.current_process = None
+        self._player_lock = asyncio.Lock()
+        self._player_idle_at = 0.0
+        self._player_release = None
+        
+        # LRU cache bookkeeping: {cache_key: (size_bytes, last_used)}
+        self.cache_enabled = cache_enabled
+        self.max_cache_files = max_cache_files
+        self.max_cache_bytes = max_cache_bytes
+        self.cache_max_age = cache_max_age_days * 86400
+        self._cache_index: Dict[str, Tuple[int, float]] = {}
+        self._writes_since_curate = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._load_cache_index()
         
         # Stylish-TTS setup
-        self.onnx_model_path = Path(__file__).parent.parent.parent / "stylish-tts" / "stylish_1.onnx"
+        model_dir = Path(__file__).parent.parent.parent / "stylish-tts"
+        self.onnx_model_path = model_dir / "stylish_1.onnx"
+        
+        # Prefer the INT8 model produced by quantize_stylish_tts.py when present
+        int8_model_path = model_dir / "stylish_1.int8.onnx"
+        if int8_model_path.exists():
+            self.onnx_model_path = int8_model_path
+        # Upper bound of the CUDA arena in bytes
+        self.gpu_mem_limit = gpu_mem_limit
         self.g2p = vi.VIG2P()
-        self.tone_arrow = {
-            "1": "",
-            "2": "↘",
-            "3": "→",
-            "4": "⤺",
-            "5": "↗",
-            "6": "↓",
-        }
+        # Per-instance memo of the pure text pipeline, repeated chunks skip it entirely
+        self._tokenize = functools.lru_cache(maxsize=TOKEN_CACHE_SIZE)(self._tokenize_uncached)
         self.model_config = None
         self.text_cleaner = None
         self.session = None
+        self.io_binding = None
+        # Inference runs in worker threads; the shared IOBinding must not be used concurrently
+        self._binding_lock = threading.Lock()
+        self._device = 'cpu'
+        self._output_name = None
         
         # Initialize Stylish-TTS model
         self._init_stylish_tts()
@@ -61,38 +138,85 @@ class TTSEngine:
             # Use default voice if not specified
             if not voice:
                 voice = self.default_voice
+            if speed is None:
+                speed = 1.0
+                
+            if not self.cache_enabled:
+                return await self._speak_uncached(text, voice, speed, volume)
                 
             # Create cache key from text and parameters
             cache_key = self._generate_cache_key(text, voice, speed)
             cache_file = self.cache_dir / f"{cache_key}.wav"
             
             # Check cache
-            if not cache_file.exists():
+            streamed = False
+            if cache_key in self._cache_index and self._touch_cache_entry(cache_key, cache_file):
+                logger.info("Using cached TTS file")
+            elif cache_key in self._inflight:
+                # Same text is already being synthesized, wait for that result
+                logger.info("Waiting for in-flight TTS generation")
+                if not await asyncio.shield(self._inflight[cache_key]):
+                    logger.error("Failed to generate TTS")
+                    return False
+            else:
                 logger.info(f"Generating TTS for: {text[:50]}...")
-                success = await self._generate_tts(text, voice, speed, cache_file)
+                future = asyncio.get_running_loop().create_future()
+                self._inflight[cache_key] = future
+                success = False
+                try:
+                    # Cache misses are played while synthesis is still running
+                    success, streamed = await self._stream_tts(text, voice, speed, cache_file)
+                    if success:
+                        self._add_cache_entry(cache_key, cache_file)
+                finally:
+                    del self._inflight[cache_key]
+                    future.set_result(success)
                 if not success:
                     logger.error("Failed to generate TTS")
                     return False
-            else:
-                logger.info("Using cached TTS file")
             
             # Play audio file
-            await self._play_audio(cache_file, volume)
+            if not streamed:
+                await self._play_audio(cache_file, volume)
             return True
             
         except Exception as e:
             logger.error(f"Error in TTS speak: {e}")
             return False
     
+    async def _speak_uncached(self, text: str, voice: str, speed: float, volume: float) -> bool:
+        """Synthesize into a temporary file that is deleted after playback, leaving the cache untouched"""
+        fd, path = tempfile.mkstemp(prefix='tts-', suffix='.wav')
+        os.close(fd)
+        audio_file = Path(path)
+        try:
+            logger.info(f"Generating TTS for: {text[:50]}...")
+            success, streamed = await self._stream_tts(text, voice, speed, audio_file)
+            if not success:
+                logger.error("Failed to generate TTS")
+                return False
+            if not streamed:
+                await self._play_audio(audio_file, volume)
+            return True
+        finally:
+            try:
+                audio_file.unlink()
+            except FileNotFoundError:
+                pass
+    
     async def stop(self):
         """Stop current TTS playback"""
         if self.current_process:
             try:
-                self.current_process.terminate()
-                await asyncio.sleep(0.5)
-                if self.current_process.poll() is None:
-                    self.current_process.kill()
+                if self.current_process.returncode is None:
+                    self.current_process.terminate()
+                    try:
+                        await asyncio.wait_for(self.current_process.wait(), timeout=0.2)
+                    except asyncio.TimeoutError:
+                        self.current_process.kill()
+                        await self.current_process.wait()
                 self.current_process = None
+                self._player_idle_at = 0.0
                 logger.info("TTS stopped")
             except Exception as e:
                 logger.error(f"Error stopping TTS: {e}")
@@ -100,20 +224,93 @@ class TTSEngine:
     def clear_cache(self):
         """Clear TTS cache"""
         try:
-            for cache_file in self.cache_dir.glob("*.wav"):
-                cache_file.unlink()
+            with os.scandir(self.cache_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.wav'):
+                        os.unlink(entry.path)
+            self._cache_index.clear()
             logger.info("TTS cache cleared")
         except Exception as e:
             logger.error(f"Error clearing TTS cache: {e}")
     
     def get_cache_size(self) -> int:
         """Get cache size (number of files)"""
-        return len(list(self.cache_dir.glob("*.wav")))
+        return len(self._cache_index)
     
-    def _generate_cache_key(self, text: str, voice: str, speed: float) -> str:
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _generate_cache_key(text: str, voice: str, speed: float) -> str:
         """Create cache key from text and parameters"""
-        content = f"{text}_{voice}_{speed}"
-        return hashlib.md5(content.encode('utf-8')).hexdigest()
+        h = hashlib.blake2b(digest_size=16, key=CACHE_KEY_VERSION)
+        h.update(text.encode('utf-8'))
+        h.update(b'\x00')
+        h.update(voice.encode('utf-8'))
+        h.update(b'\x00')
+        h.update(struct.pack('<d', speed))
+        return h.hexdigest()
+    
+    def _load_cache_index(self):
+        """Build the LRU index from files already in the cache directory"""
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.wav'):
+                    continue
+                try:
+                    stat = entry.stat()
+                    self._cache_index[entry.name[:-4]] = (stat.st_size, stat.st_mtime)
+                except OSError:
+                    continue
+        self._curate()
+    
+    def _touch_cache_entry(self, cache_key: str, cache_file: Path) -> bool:
+        """Mark a cache entry as recently used, returns False if its file is gone"""
+        now = time.time()
+        try:
+            # Persist recency in the file mtime so it survives restarts
+            os.utime(cache_file, (now, now))
+        except FileNotFoundError:
+            del self._cache_index[cache_key]
+            return False
+        except OSError:
+            pass
+        size, _ = self._cache_index[cache_key]
+        self._cache_index[cache_key] = (size, now)
+        return True
+    
+    def _add_cache_entry(self, cache_key: str, cache_file: Path):
+        """Register a newly generated cache file, curating every few writes"""
+        self._cache_index[cache_key] = (cache_file.stat().st_size, time.time())
+        self._writes_since_curate += 1
+        if self._writes_since_curate >= CURATE_EVERY:
+            self._curate()
+    
+    def _curate(self):
+        """Evict expired entries, then least recently used ones until within limits"""
+        self._writes_since_curate = 0
+        now = time.time()
+        entries = sorted(self._cache_index.items(), key=lambda item: item[1][1])
+        total_bytes = sum(size for size, _ in self._cache_index.values())
+        count = len(entries)
+        evicted = 0
+        
+        for cache_key, (size, last_used) in entries:
+            expired = self.cache_max_age > 0 and now - last_used > self.cache_max_age
+            if not expired and count <= self.max_cache_files and total_bytes <= self.max_cache_bytes:
+                break
+            try:
+                (self.cache_dir / f"{cache_key}.wav").unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to evict TTS cache file {cache_key}: {e}")
+                continue
+            del self._cache_index[cache_key]
+            total_bytes -= size
+            count -= 1
+            evicted += 1
+        
+        if evicted:
+            logger.info(f"Evicted {evicted} TTS cache files")
     
     def _init_stylish_tts(self):
         """Initialize Stylish-TTS model"""
@@ -122,56 +319,105 @@ class TTSEngine:
                 logger.error(f"ONNX model not found at {self.onnx_model_path}")
                 return
                 
-            # Load model config from ONNX metadata
-            model_config_str = self._read_meta_data_onnx(str(self.onnx_model_path), "model_config")
+            # Graphs optimized up to the hardware-independent EXTENDED level are saved next
+            # to the model so later starts skip most of the optimizer; layout optimizations
+            # still run in memory. CUDA graphs are EP-specific, so they are never saved
+            model_path = self.onnx_model_path
+            optimized_path = model_path.with_suffix(".opt.onnx")
+            save_path = None
+            if "CUDAExecutionProvider" not in ort.get_available_providers():
+                if optimized_path.exists() and optimized_path.stat().st_mtime >= model_path.stat().st_mtime:
+                    model_path = optimized_path
+                else:
+                    save_path = optimized_path
+            
+            try:
+                session = self._create_session(model_path, save_path)
+            except Exception as e:
+                if model_path == self.onnx_model_path and save_path is None:
+                    raise
+                # Unreadable cached graph or read-only model directory
+                logger.warning(f"Optimized model unavailable ({e}), loading {self.onnx_model_path.name}")
+                model_path = self.onnx_model_path
+                session = self._create_session(model_path)
+            
+            # Load model config from the metadata of the loaded model, which ONNX Runtime
+            # also writes into the optimized copy
+            model_config_str = session.get_modelmeta().custom_metadata_map.get("model_config")
             if not model_config_str:
-                logger.error("No model_config found in ONNX metadata")
+                logger.error(f"No model_config found in ONNX metadata of {model_path.name}")
                 return
                 
             self.model_config = ModelConfig.model_validate_json(model_config_str)
             self.text_cleaner = TextCleaner(self.model_config.symbol)
+            self.session = session
             
-            # Initialize ONNX session
-            self.session = ort.InferenceSession(
-                str(self.onnx_model_path),
-                providers=["CUDAExecutionProvider", "CPUExecutionProvider"]
-            )
+            # Reused binding: inputs are copied to the device once, the output stays there until fetched
+            self.io_binding = self.session.io_binding()
+            self._device = 'cuda' if 'CUDAExecutionProvider' in self.session.get_providers() else 'cpu'
+            self._output_name = self.session.get_outputs()[0].name
+            self._warm_up()
             
             logger.info("Stylish-TTS model initialized successfully")
             
         except Exception as e:
             logger.error(f"Error initializing Stylish-TTS: {e}")
             
-    def _read_meta_data_onnx(self, filename, key):
-        """Read metadata from ONNX model"""
+    def _create_session(self, model_path: Path, save_path: Optional[Path] = None):
+        """Create the ONNX session, leaving one core for the event loop"""
+        sess_options = ort.SessionOptions()
+        sess_options.intra_op_num_threads = max(1, (os.cpu_count() or 1) - 1)
+        sess_options.inter_op_num_threads = 1
+        sess_options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        sess_options.enable_mem_pattern = True
+        sess_options.enable_cpu_mem_arena = True
+        sess_options.add_session_config_entry("session.disable_prepacking", "0")
+        if save_path:
+            sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+            sess_options.optimized_model_filepath = str(save_path)
+        else:
+            sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            
+        return ort.InferenceSession(
+            str(model_path),
+            sess_options=sess_options,
+            providers=[
+                ("CUDAExecutionProvider", {**CUDA_PROVIDER_OPTIONS, "gpu_mem_limit": self.gpu_mem_limit}),
+                "CPUExecutionProvider"
+            ]
+        )
+        
+    def _warm_up(self):
+        """Run throwaway inferences to pay kernel selection and arena growth up front"""
         try:
-            model = onnx.load(filename)
-            for prop in model.metadata_props:
-                if prop.key == key:
-                    return prop.value
+            for length in WARMUP_LENGTHS:
+                self.session.run(None, {
+                    "texts": np.zeros((1, length), dtype=np.int64),
+                    "text_lengths": np.array([length], dtype=np.int64)
+                })
+            logger.debug("Stylish-TTS session warmed up")
         except Exception as e:
-            logger.error(f"Error reading ONNX metadata: {e}")
-        return None
-        
+            logger.warning(f"Stylish-TTS warm-up failed: {e}")
+            
     def _arrowize(self, ipa: str) -> str:
         """Convert tone numbers to arrows"""
-        return re.sub(r"[1-6]", lambda m: self.tone_arrow[m.group()], ipa)
+        return ipa.translate(TONE_ARROWS)
         
     def _split_text_into_chunks(self, text, max_sentences=2):
         """Split text into manageable chunks"""
-        sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+        sentences = SENTENCE_SPLIT_RE.split(text.strip())
         return [' '.join(sentences[i:i + max_sentences]) for i in range(0, len(sentences), max_sentences)]
         
     def _split_text_with_pause(self, text):
         """Handle pause tags in text"""
-        parts = re.split(r'(<pause\s+\d+>)', text)
+        parts = PAUSE_SPLIT_RE.split(text)
         result = []
         for part in parts:
             part = part.strip()
             if not part:
                 continue
             if part.startswith("<pause"):
-                match = re.match(r'<pause\s+(\d+)>', part)
+                match = PAUSE_TAG_RE.match(part)
                 if match:
                     pause_duration = int(match.group(1))
                     result.append(("pause", pause_duration))
@@ -179,36 +425,165 @@ class TTSEngine:
                 result.append(("text", part))
         return result
         
+    def _tokenize_uncached(self, text_input):
+        """Normalize, phonemize and tokenize text"""
+        cleaner = ViCleaner(text_input)
+        normalized_text = cleaner.clean()
+        ipa_num, _ = self.g2p(normalized_text)
+        ipa_arrow = self._arrowize(ipa_num)
+        return tuple(self.text_cleaner(ipa_arrow))
+
+    def _prepare_inputs(self, text_input):
+        """Build the model's input arrays from (memoized) text tokens"""
+        tokens = self._tokenize(text_input)
+        texts = np.zeros((1, len(tokens) + 2), dtype=np.int64)
+        texts[0, 1:len(tokens) + 1] = tokens
+        text_lengths = np.array([len(tokens) + 2], dtype=np.int64)
+        return texts, text_lengths
+
     def _synthesize_chunk(self, text_input):
         """Synthesize a single chunk of text"""
         try:
-            cleaner = ViCleaner(text_input)
-            normalized_text = cleaner.clean()
-            ipa_num, _ = self.g2p(normalized_text)
-            ipa_arrow = self._arrowize(ipa_num)
+            texts, text_lengths = self._prepare_inputs(text_input)
 
-            tokens = torch.tensor(self.text_cleaner(ipa_arrow)).unsqueeze(0)
-            texts = torch.zeros([1, tokens.shape[1] + 2], dtype=int)
-            texts[0][1 : tokens.shape[1] + 1] = tokens
-            text_lengths = torch.zeros([1], dtype=int)
-            text_lengths[0] = tokens.shape[1] + 2
+            binding = self.io_binding
+            with self._binding_lock:
+                binding.bind_cpu_input("texts", texts)
+                binding.bind_cpu_input("text_lengths", text_lengths)
+                binding.bind_output(self._output_name, self._device)
+                try:
+                    self.session.run_with_iobinding(binding)
+                    outputs = binding.copy_outputs_to_cpu()
+                finally:
+                    binding.clear_binding_inputs()
+                    binding.clear_binding_outputs()
 
-            outputs = self.session.run(
-                None,
-                {
-                    "texts": texts.cpu().numpy(),
-                    "text_lengths": text_lengths.cpu().numpy(),
-                },
-            )
-            samples = np.multiply(outputs[0], 32768).astype(np.int16)
-            return samples
+            # Scale in place on the array we own, clipping so peaks at +-1.0 don't wrap
+            audio = outputs[0].reshape(-1)
+            np.multiply(audio, 32767, out=audio)
+            np.clip(audio, -32768, 32767, out=audio)
+            np.rint(audio, out=audio)
+            return audio.astype(np.int16)
             
         except Exception as e:
             logger.error(f"Error synthesizing chunk: {e}")
             return None
 
     async def _generate_tts(self, text: str, voice: str, speed: float, output_file: Path) -> bool:
-        """Create TTS file using Stylish-TTS"""
+        """Create TTS file using Stylish-TTS in a worker thread"""
+        return await asyncio.to_thread(self._blocking_generate, text, output_file)
+        
+    async def _stream_tts(self, text: str, voice: str, speed: float, output_file: Path) -> Tuple[bool, bool]:
+        """Create TTS file while playing each segment as soon as it is synthesized
+        
+        Returns (generated, played); played is False when streaming playback was not possible.
+        """
+        try:
+            player = await self._ensure_player()
+        except FileNotFoundError:
+            return await self._generate_tts(text, voice, speed, output_file), False
+        
+        loop = asyncio.get_running_loop()
+        segments: asyncio.Queue = asyncio.Queue()
+        
+        def produce():
+            try:
+                return self._blocking_generate(
+                    text, output_file,
+                    on_segment=lambda samples: loop.call_soon_threadsafe(segments.put_nowait, samples)
+                )
+            finally:
+                loop.call_soon_threadsafe(segments.put_nowait, None)
+        
+        producer = asyncio.ensure_future(asyncio.to_thread(produce))
+        async with self._player_lock:
+            played = await self._play_audio_stream(player, segments)
+        success = await producer
+        return success, played
+    
+    async def _play_audio_stream(self, player, segments: asyncio.Queue) -> bool:
+        """Feed PCM segments to the player until the producer is done"""
+        writable = True
+        while True:
+            samples = await segments.get()
+            if samples is None:
+                break
+            # After a failed write keep draining so the producer can finish the cache file
+            if writable:
+                writable = await self._write_pcm(player, samples.tobytes())
+        
+        if writable:
+            await self._wait_player_idle(player)
+            self._schedule_player_release()
+            logger.info("TTS audio streamed successfully")
+            return True
+        # A stopped player counts as played; a crashed one falls back to playing the file
+        return self.current_process is not player
+    
+    async def _ensure_player(self):
+        """Return the shared aplay process, spawning it if it isn't running"""
+        if self.current_process is None or self.current_process.returncode is not None:
+            self.current_process = await asyncio.create_subprocess_exec(
+                'aplay', '-q', '-f', 'S16_LE', '-r', str(SAMPLE_RATE), '-c', '1', '-',
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            self._player_idle_at = 0.0
+        return self.current_process
+    
+    def _schedule_player_release(self):
+        """(Re)arm the timer that closes the player once it has been idle long enough"""
+        if self._player_release:
+            self._player_release.cancel()
+        self._player_release = asyncio.get_running_loop().call_later(
+            PLAYER_IDLE_TIMEOUT, self._release_idle_player
+        )
+    
+    def _release_idle_player(self):
+        """Close the idle player's stdin so aplay drains, exits and frees the sound device"""
+        self._player_release = None
+        player = self.current_process
+        # Busy players re-arm the timer when their utterance ends
+        if player is None or self._player_lock.locked():
+            return
+        self.current_process = None
+        self._player_idle_at = 0.0
+        if player.returncode is None:
+            player.stdin.close()
+        logger.debug("Closed idle TTS player")
+    
+    async def _write_pcm(self, player, pcm: bytes) -> bool:
+        """Queue PCM on the player and track when it will have played everything"""
+        try:
+            player.stdin.write(pcm)
+            await player.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            return False
+        now = asyncio.get_running_loop().time()
+        self._player_idle_at = max(now, self._player_idle_at) + len(pcm) / (2 * SAMPLE_RATE)
+        return True
+    
+    async def _wait_player_idle(self, player):
+        """Wait until queued audio has played, or the player exits"""
+        delay = self._player_idle_at - asyncio.get_running_loop().time()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(player.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+    
+    @staticmethod
+    def _read_pcm(audio_file: Path) -> Optional[bytes]:
+        """Read raw frames from a WAV in the player's format, None for any other format"""
+        with wave.open(str(audio_file), 'rb') as wav:
+            if (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()) != (1, 2, SAMPLE_RATE):
+                return None
+            return wav.readframes(wav.getnframes())
+        
+    def _blocking_generate(self, text: str, output_file: Path,
+                           on_segment: Optional[Callable[[np.ndarray], None]] = None) -> bool:
+        """Synthesize text and write it to output_file, passing each segment to on_segment"""
         try:
             if not self.session or not self.text_cleaner:
                 logger.error("Stylish-TTS not properly initialized")
@@ -218,7 +593,7 @@ class TTSEngine:
             
             # Process text with pause handling
             parts = self._split_text_with_pause(text)
-            full_audio = AudioSegment.empty()
+            segments = []
             
             for part_type, content in parts:
                 if part_type == "text":
@@ -229,18 +604,27 @@ class TTSEngine:
                         logger.debug(f"Synthesizing chunk: {chunk}")
                         samples = self._synthesize_chunk(chunk)
                         if samples is not None:
-                            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmpfile:
-                                write(tmpfile.name, 24000, samples)
-                                audio = AudioSegment.from_wav(tmpfile.name)
-                                full_audio += audio
-                                os.remove(tmpfile.name)
+                            segments.append(samples)
+                            if on_segment:
+                                on_segment(samples)
                 elif part_type == "pause":
                     logger.debug(f"Adding pause: {content}ms")
-                    pause_audio = AudioSegment.silent(duration=content)
-                    full_audio += pause_audio
+                    frames = content * SAMPLE_RATE // 1000
+                    if frames <= len(SILENCE):
+                        silence = SILENCE[:frames]
+                    else:
+                        silence = np.zeros(frames, dtype=np.int16)
+                    segments.append(silence)
+                    if on_segment:
+                        on_segment(silence)
             
-            # Export final audio
-            full_audio.export(str(output_file), format="wav")
+            # Write the whole utterance in one go
+            full_audio = np.concatenate(segments) if segments else np.zeros(0, dtype=np.int16)
+            with wave.open(str(output_file), 'wb') as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(SAMPLE_RATE)
+                wav.writeframes(full_audio.tobytes())
             logger.info("TTS generated successfully with Stylish-TTS")
             return True
             
@@ -251,48 +635,41 @@ class TTSEngine:
     async def _play_audio(self, audio_file: Path, volume: float):
         """Play audio file"""
         try:
-            # Adjust volume (0.0 - 1.0)
-            volume_percent = int(volume * 100)
-            
-            # Try using aplay
-            cmd = ['aplay', str(audio_file)]
-            
-            self.current_process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            await self.current_process.wait()
-            
-            if self.current_process.returncode == 0:
-                logger.info("TTS audio played successfully")
-            else:
-                # Fallback to other audio players
+            pcm = await asyncio.to_thread(self._read_pcm, audio_file)
+            if pcm is None:
                 await self._play_audio_fallback(audio_file)
+                return
                 
-        except FileNotFoundError:
+            player = await self._ensure_player()
+            async with self._player_lock:
+                if await self._write_pcm(player, pcm):
+                    await self._wait_player_idle(player)
+                    self._schedule_player_release()
+                    logger.info("TTS audio played successfully")
+                elif self.current_process is player:
+                    # aplay exited on its own, try other audio players
+                    await self._play_audio_fallback(audio_file)
+                
+        except (FileNotFoundError, wave.Error):
             await self._play_audio_fallback(audio_file)
         except Exception as e:
             logger.error(f"Error playing TTS audio: {e}")
     
     async def _play_audio_fallback(self, audio_file: Path):
         """Fallback audio player methods"""
-        players = ['mpg123', 'sox', 'paplay']
-        
-        for player in players:
+        for player, path in FALLBACK_PLAYERS:
             try:
                 if player == 'mpg123':
-                    cmd = [player, '-q', str(audio_file)]
+                    cmd = [path, '-q', str(audio_file)]
                 elif player == 'sox':
-                    cmd = [player, str(audio_file), '-d']
+                    cmd = [path, str(audio_file), '-d']
                 elif player == 'paplay':
-                    cmd = [player, str(audio_file)]
+                    cmd = [path, str(audio_file)]
                 
                 process = await asyncio.create_subprocess_exec(
                     *cmd,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.DEVNULL
                 )
                 
                 await process.wait()
@@ -3,12 +3,49 @@ import subprocess
 import logging
 import re
 import os
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import json
 
 logger = logging.getLogger(__name__)
 
+# Search query -> video URL memo; rankings drift, so entries expire after a few hours
+SEARCH_CACHE_SIZE = 256
+SEARCH_CACHE_TTL = 4 * 3600
+
+# URLs come from the network; longer ones are rejected before any regex runs
+MAX_URL_LENGTH = 2048
+
+# Hosts and paths accepted for single videos and for playlists
+YOUTUBE_URL_RE = re.compile(
+    r'youtube\.com/watch\?v='
+    r'|youtu\.be/'
+    r'|youtube\.com/embed/'
+    r'|music\.youtube\.com/watch\?v='
+)
+YOUTUBE_PLAYLIST_RE = re.compile(
+    r'youtube\.com/playlist\?list='
+    r'|youtube\.com/watch\?(?:[^#\s]{0,512}&)?list='
+    r'|music\.youtube\.com/playlist\?list='
+)
+
+FILENAME_STRIP_RE = re.compile(r'[^\w\s-]')
+FILENAME_DASH_RE = re.compile(r'[-\s]+')
+
+def is_valid_youtube_url(url: str) -> bool:
+    """Check if YouTube URL is valid"""
+    if len(url) > MAX_URL_LENGTH:
+        return False
+    return YOUTUBE_URL_RE.search(url) is not None
+
+def is_valid_youtube_playlist_url(url: str) -> bool:
+    """Check if YouTube playlist URL is valid"""
+    if len(url) > MAX_URL_LENGTH:
+        return False
+    return YOUTUBE_PLAYLIST_RE.search(url) is not None
+
 class YouTubePlayer:
     def __init__(self, cache_dir: str = "./audio/youtube_cache"):
         self.cache_dir = Path(cache_dir)
@@ -16,6 +53,9 @@ class YouTubePlayer:
         self.current_process = None
         self.is_playing = False
         self.volume = 50
+        # Bumped by stop() so a playlist loop notices it was interrupted between videos
+        self._play_token = 0
+        self._search_cache: Dict[str, Tuple[float, str]] = OrderedDict()
         
     async def play_youtube_url(self, url: str, audio_only: bool = True):
         """Play music from YouTube URL"""
@@ -25,64 +65,7 @@ class YouTubePlayer:
                 return False
                 
             await self.stop()
-            
-            if audio_only:
-                # Audio only, save bandwidth
-                cmd = [
-                    'yt-dlp',
-                    '--extract-audio',
-                    '--audio-format', 'mp3',
-                    '--output', '-',
-                    url
-                ]
-                
-                # Pipe to audio player
-                yt_process = await asyncio.create_subprocess_exec(
-                    *cmd,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                
-                # Play with mpg123
-                play_cmd = ['mpg123', '-q', '-']
-                self.current_process = await asyncio.create_subprocess_exec(
-                    *play_cmd,
-                    stdin=yt_process.stdout,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                
-                self.is_playing = True
-                await self.current_process.wait()
-                await yt_process.wait()
-                
-            else:
-                # Play video (requires display)
-                cmd = [
-                    'yt-dlp',
-                    '--format', 'best[height<=480]',  # Limit quality for Jetson
-                    '--output', '-',
-                    url
-                ]
-                
-                yt_process = await asyncio.create_subprocess_exec(
-                    *cmd,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                
-                # Play with mpv
-                play_cmd = ['mpv', '--vo=gpu', '--hwdec=auto', '-']
-                self.current_process = await asyncio.create_subprocess_exec(
-                    *play_cmd,
-                    stdin=yt_process.stdout,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                
-                self.is_playing = True
-                await self.current_process.wait()
-                await yt_process.wait()
+            await self._play_source(url, audio_only)
                 
             logger.info(f"Successfully played YouTube content: {url}")
             return True
@@ -91,6 +74,60 @@ class YouTubePlayer:
             logger.error(f"Error playing YouTube URL {url}: {e}")
             return False
     
+    async def _play_source(self, source: str, audio_only: bool, extra_args: Optional[List[str]] = None):
+        """Stream a URL or yt-dlp search target through a single yt-dlp run into the player"""
+        if audio_only:
+            # Audio only, save bandwidth
+            cmd = [
+                'yt-dlp',
+                '--extract-audio',
+                '--audio-format', 'mp3',
+                '--output', '-'
+            ]
+            
+            # Play with mpg123
+            play_cmd = ['mpg123', '-q', '-']
+            
+        else:
+            # Play video (requires display)
+            cmd = [
+                'yt-dlp',
+                '--format', 'best[height<=480]',  # Limit quality for Jetson
+                '--output', '-'
+            ]
+            
+            # Play with mpv
+            play_cmd = ['mpv', '--vo=gpu', '--hwdec=auto', '-']
+            
+        cmd.extend(extra_args or [])
+        cmd.append(source)
+        await self._play_pipeline(cmd, play_cmd)
+    
+    async def _play_pipeline(self, source_cmd: List[str], play_cmd: List[str]):
+        """Pipe yt-dlp output into a player process and wait for playback to end"""
+        # A real OS pipe: the player reads yt-dlp's stdout directly, and neither
+        # process writes into an undrained PIPE that could fill up and stall it
+        read_fd, write_fd = os.pipe()
+        try:
+            yt_process = await asyncio.create_subprocess_exec(
+                *source_cmd,
+                stdout=write_fd,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            self.current_process = await asyncio.create_subprocess_exec(
+                *play_cmd,
+                stdin=read_fd,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+        finally:
+            os.close(read_fd)
+            os.close(write_fd)
+            
+        self.is_playing = True
+        await self.current_process.wait()
+        await yt_process.wait()
+    
     async def search_and_play(self, query: str, audio_only: bool = True):
         """Search and play music from YouTube"""
         try:
@@ -108,65 +145,48 @@ class YouTubePlayer:
     async def _search_and_play_in_container(self, query: str, audio_only: bool = True):
         """Legacy method to play in container"""
         try:
-            # Search for first video
-            search_cmd = [
-                'yt-dlp',
-                '--get-url',
-                '--get-title',
-                f'ytsearch1:{query}'
-            ]
-            
-            process = await asyncio.create_subprocess_exec(
-                *search_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode == 0:
-                lines = stdout.decode().strip().split('\n')
-                if len(lines) >= 2:
-                    title = lines[0]
-                    url = lines[1]
-                    
-                    logger.info(f"Found: {title}")
-                    logger.info(f"URL: {url}")
-                    
-                    return await self.play_youtube_url(url, audio_only)
-                else:
-                    logger.error(f"No results found for: {query}")
-                    return False
-            else:
-                logger.error(f"Search failed: {stderr.decode()}")
+            await self.stop()
+            url = await self._resolve_search(query)
+            if not url:
+                logger.error(f"No results found for: {query}")
                 return False
                 
+            logger.info(f"Playing first YouTube result for '{query}': {url}")
+            await self._play_source(url, audio_only, ['--no-playlist'])
+            return True
+                
         except Exception as e:
             logger.error(f"Error searching YouTube for '{query}': {e}")
             return False
     
+    async def _resolve_search(self, query: str) -> Optional[str]:
+        """Find the URL of the first search result, memoized per query"""
+        key = query.strip().lower()
+        now = time.monotonic()
+        cached = self._search_cache.get(key)
+        if cached and now - cached[0] < SEARCH_CACHE_TTL:
+            self._search_cache.move_to_end(key)
+            return cached[1]
+            
+        info = await asyncio.to_thread(self._extract_info, f'ytsearch1:{query}', extract_flat='in_playlist')
+        entries = info.get('entries') or []
+        if not entries or not entries[0]:
+            return None
+            
+        entry = entries[0]
+        url = entry.get('url') or f"https://www.youtube.com/watch?v={entry['id']}"
+        self._search_cache[key] = (now, url)
+        self._search_cache.move_to_end(key)
+        if len(self._search_cache) > SEARCH_CACHE_SIZE:
+            self._search_cache.popitem(last=False)
+        return url
+    
     async def _play_on_macos_host(self, param: str, command_type: str):
         """Call script on macOS host to play audio"""
         try:
-            # Script path in container (mounted from host)
-            script_path = "/app/play_audio_macos.sh"
-            
-            # Run script on host through reverse docker exec
-            cmd = ['sh', '-c', f'echo "{param}" > /tmp/mediacenter_request && echo "{command_type}" > /tmp/mediacenter_command']
-            
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            await process.wait()
-            
-            # Create signal file for host script to read
-            with open('/tmp/mediacenter_request', 'w') as f:
-                f.write(param)
-            with open('/tmp/mediacenter_command', 'w') as f:
-                f.write(command_type)
+            # Create signal files for host script to read, the request before its command
+            await asyncio.to_thread(self._write_signal_file, '/tmp/mediacenter_request', param)
+            await asyncio.to_thread(self._write_signal_file, '/tmp/mediacenter_command', command_type)
                 
             logger.info(f"Created request for macOS host: {command_type} - {param}")
             return True
@@ -175,6 +195,14 @@ class YouTubePlayer:
             logger.error(f"Error calling macOS host script: {e}")
             return False
     
+    @staticmethod
+    def _write_signal_file(path: str, content: str):
+        """Replace a signal file atomically so the host never reads a partial write"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    
     async def play_youtube_playlist(self, playlist_url: str, audio_only: bool = True, shuffle: bool = False):
         """Play YouTube playlist"""
         try:
@@ -182,73 +210,155 @@ class YouTubePlayer:
                 logger.error(f"Invalid YouTube playlist URL: {playlist_url}")
                 return False
                 
-            # Get list of videos in playlist
-            list_cmd = [
-                'yt-dlp',
-                '--get-url',
-                '--get-title',
-                '--playlist-items', '1-20',  # Limit to first 20 videos
-                playlist_url
-            ]
+            await self.stop()
+            token = self._play_token
             
-            if shuffle:
-                list_cmd.extend(['--playlist-random'])
+            videos = await self._list_playlist(playlist_url, shuffle)
+            if not videos:
+                return False
                 
-            process = await asyncio.create_subprocess_exec(
-                *list_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
+            logger.info(f"Found {len(videos)} videos in playlist")
             
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode == 0:
-                lines = stdout.decode().strip().split('\n')
-                
-                # Parse title and URL pairs
-                videos = []
-                for i in range(0, len(lines), 2):
-                    if i + 1 < len(lines):
-                        title = lines[i]
-                        url = lines[i + 1]
-                        videos.append({'title': title, 'url': url})
-                
-                logger.info(f"Found {len(videos)} videos in playlist")
-                
-                # Play each video
+            if not audio_only:
+                # Videos are too large to prefetch, and mpv only plays the first of several
+                # containers concatenated on one pipe, so each video gets its own yt-dlp run
                 for video in videos:
-                    if not self.is_playing:  # Might be stopped
+                    if token != self._play_token:
                         break
-                        
                     logger.info(f"Playing: {video['title']}")
-                    await self.play_youtube_url(video['url'], audio_only)
-                    
+                    await self._play_source(f"https://youtu.be/{video['id']}", audio_only)
+                if token == self._play_token:
+                    self.is_playing = False
                 return True
-            else:
-                logger.error(f"Failed to get playlist: {stderr.decode()}")
-                return False
+                
+            await self._play_prefetched(videos)
+            return True
                 
         except Exception as e:
             logger.error(f"Error playing YouTube playlist {playlist_url}: {e}")
             return False
     
+    async def _list_playlist(self, playlist_url: str, shuffle: bool = False) -> List[Dict[str, str]]:
+        """Get video ids and titles of a playlist without resolving their streams"""
+        params = {
+            'extract_flat': 'in_playlist',
+            'playlist_items': '1-20'  # Limit to first 20 videos
+        }
+        
+        if shuffle:
+            params['playlistrandom'] = True
+            
+        try:
+            info = await asyncio.to_thread(self._extract_info, playlist_url, **params)
+        except Exception as e:
+            logger.error(f"Failed to get playlist: {e}")
+            return []
+            
+        return [
+            {'id': entry['id'], 'title': entry.get('title') or entry['id']}
+            for entry in info.get('entries') or []
+            if entry and entry.get('id')
+        ]
+    
+    @staticmethod
+    def _extract_info(target: str, process: bool = True, **params) -> Dict[str, Any]:
+        """Look up metadata with the in-process yt-dlp API instead of spawning the CLI"""
+        from yt_dlp import YoutubeDL
+        
+        options = {'quiet': True, 'no_warnings': True, 'skip_download': True, **params}
+        with YoutubeDL(options) as ydl:
+            return ydl.extract_info(target, download=False, process=process)
+    
+    async def _prefetch_tracks(self, videos: List[Dict[str, str]], tracks: asyncio.Queue):
+        """Download upcoming tracks into memory while the current one plays"""
+        try:
+            for video in videos:
+                try:
+                    process = await asyncio.create_subprocess_exec(
+                        'yt-dlp',
+                        '--extract-audio',
+                        '--audio-format', 'mp3',
+                        '--output', '-',
+                        f"https://youtu.be/{video['id']}",
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.DEVNULL
+                    )
+                except OSError as e:
+                    logger.warning(f"Failed to fetch: {video['title']}: {e}")
+                    continue
+                    
+                try:
+                    audio, _ = await process.communicate()
+                except asyncio.CancelledError:
+                    if process.returncode is None:
+                        process.kill()
+                    raise
+                    
+                if process.returncode == 0 and audio:
+                    await tracks.put((video['title'], audio))
+                else:
+                    logger.warning(f"Failed to fetch: {video['title']}")
+                    
+        except Exception as e:
+            logger.error(f"Error prefetching playlist tracks: {e}")
+            
+        # Always mark the end, otherwise the player waits on the queue forever
+        await tracks.put(None)
+    
+    async def _play_prefetched(self, videos: List[Dict[str, str]]):
+        """Play playlist tracks gaplessly through one player fed from the prefetch queue"""
+        self.current_process = player = await asyncio.create_subprocess_exec(
+            'mpg123', '-q', '-',
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        self.is_playing = True
+        
+        # Track N+1 downloads while track N plays
+        tracks = asyncio.Queue(maxsize=2)
+        prefetcher = asyncio.create_task(self._prefetch_tracks(videos, tracks))
+        player_exit = asyncio.ensure_future(player.wait())
+        try:
+            while True:
+                next_track = asyncio.ensure_future(tracks.get())
+                await asyncio.wait({next_track, player_exit}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_track.done():
+                    # Player was stopped while waiting for a download
+                    next_track.cancel()
+                    return
+                track = next_track.result()
+                if track is None:
+                    break
+                    
+                title, audio = track
+                logger.info(f"Playing: {title}")
+                player.stdin.write(audio)
+                await player.stdin.drain()
+                
+            player.stdin.close()
+            await player_exit
+            
+        except (BrokenPipeError, ConnectionResetError):
+            # Player was stopped mid-track
+            pass
+        finally:
+            prefetcher.cancel()
+            player_exit.cancel()
+            if self.current_process is player:
+                self.is_playing = False
+    
     async def download_and_cache(self, url: str, filename: Optional[str] = None) -> Optional[Path]:
         """Download and cache YouTube audio for offline playback"""
         try:
             if not filename:
                 # Create filename from video title
-                info_cmd = ['yt-dlp', '--get-title', url]
-                process = await asyncio.create_subprocess_exec(
-                    *info_cmd,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                stdout, _ = await process.communicate()
-                title = stdout.decode().strip()
+                info = await asyncio.to_thread(self._extract_info, url, process=False)
+                title = (info.get('title') or '').strip()
                 
                 # Clean filename
-                filename = re.sub(r'[^\w\s-]', '', title).strip()
-                filename = re.sub(r'[-\s]+', '-', filename)
+                filename = FILENAME_STRIP_RE.sub('', title).strip()
+                filename = FILENAME_DASH_RE.sub('-', filename)
                 
             cache_file = self.cache_dir / f"{filename}.mp3"
             
@@ -268,8 +378,8 @@ class YouTubePlayer:
             
             process = await asyncio.create_subprocess_exec(
                 *download_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
             )
             
             await process.wait()
@@ -287,12 +397,16 @@ class YouTubePlayer:
     
     async def stop(self):
         """Stop YouTube playback"""
+        self._play_token += 1
         if self.current_process:
             try:
-                self.current_process.terminate()
-                await asyncio.sleep(1)
-                if self.current_process.poll() is None:
-                    self.current_process.kill()
+                if self.current_process.returncode is None:
+                    self.current_process.terminate()
+                    try:
+                        await asyncio.wait_for(self.current_process.wait(), timeout=0.2)
+                    except asyncio.TimeoutError:
+                        self.current_process.kill()
+                        await self.current_process.wait()
                 self.current_process = None
                 self.is_playing = False
                 logger.info("YouTube playback stopped")
@@ -301,39 +415,40 @@ class YouTubePlayer:
     
     def _is_valid_youtube_url(self, url: str) -> bool:
         """Check if YouTube URL is valid"""
-        youtube_patterns = [
-            r'youtube\.com/watch\?v=',
-            r'youtu\.be/',
-            r'youtube\.com/embed/',
-            r'music\.youtube\.com/watch\?v='
-        ]
-        return any(re.search(pattern, url) for pattern in youtube_patterns)
+        return is_valid_youtube_url(url)
     
     def _is_valid_youtube_playlist_url(self, url: str) -> bool:
         """Check if YouTube playlist URL is valid"""
-        playlist_patterns = [
-            r'youtube\.com/playlist\?list=',
-            r'youtube\.com/watch\?.*list=',
-            r'music\.youtube\.com/playlist\?list='
-        ]
-        return any(re.search(pattern, url) for pattern in playlist_patterns)
+        return is_valid_youtube_playlist_url(url)
     
     def clear_cache(self):
         """Clear YouTube cache"""
         try:
-            for cache_file in self.cache_dir.glob("*.mp3"):
-                cache_file.unlink()
+            with os.scandir(self.cache_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.mp3') and entry.is_file():
+                        os.unlink(entry.path)
             logger.info("YouTube cache cleared")
         except Exception as e:
             logger.error(f"Error clearing YouTube cache: {e}")
     
-    def get_cache_info(self) -> Dict[str, Any]:
+    def _scan_cache(self) -> Tuple[int, int]:
+        """Count cached files and their total size in bytes"""
+        cache_count = 0
+        total_size = 0
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.mp3') and entry.is_file():
+                    total_size += entry.stat().st_size
+                    cache_count += 1
+        return cache_count, total_size
+    
+    async def get_cache_info(self) -> Dict[str, Any]:
         """Get cache information"""
-        cache_files = list(self.cache_dir.glob("*.mp3"))
-        total_size = sum(f.stat().st_size for f in cache_files)
+        cache_count, total_size = await asyncio.to_thread(self._scan_cache)
         
         return {
-            "cache_count": len(cache_files),
+            "cache_count": cache_count,
             "total_size_mb": round(total_size / (1024 * 1024), 2),
             "cache_dir": str(self.cache_dir)
         }
\ No newline at end of file
@@ -40,22 +40,12 @@ class HC3CommandListener:
         try:
             command_type = command.get('type')
             
-            if command_type == 'play_music':
-                await self._handle_play_music(command)
-            elif command_type == 'stop_music':
-                await self._handle_stop_music()
-            elif command_type == 'play_playlist':
-                await self._handle_play_playlist(command)
-            elif command_type == 'play_youtube_search':
-                await self._handle_play_youtube_search(command)
-            elif command_type == 'play_youtube_url':
-                await self._handle_play_youtube_url(command)
-            elif command_type == 'play_youtube_playlist':
-                await self._handle_play_youtube_playlist(command)
-            elif command_type == 'volume':
-                await self._handle_volume(command)
-            else:
+            handler = self.COMMAND_HANDLERS.get(command_type)
+            if handler is None:
                 logger.warning(f"Unknown command type: {command_type}")
+                return
+                
+            await handler(self, command)
                 
         except Exception as e:
             logger.error(f"Error handling command: {e}")
@@ -67,7 +57,7 @@ class HC3CommandListener:
             await self.audio_player.play_song(song_name)
             logger.info(f"Playing song: {song_name}")
     
-    async def _handle_stop_music(self):
+    async def _handle_stop_music(self, command: Dict[str, Any]):
         """Stop playing music"""
         await self.audio_player.stop()
         logger.info("Music stopped")
@@ -107,5 +97,22 @@ class HC3CommandListener:
     async def _handle_volume(self, command: Dict[str, Any]):
         """Adjust volume"""
         volume = command.get('volume', 50)
-        await self.audio_player.set_volume(volume)
-        logger.info(f"Volume set to: {volume}")
\ No newline at end of file
+        self.audio_player.set_volume(volume)
+        logger.info(f"Volume set to: {volume}")
+
+    async def _handle_refresh_library(self, command: Dict[str, Any]):
+        """Re-scan the music library"""
+        await self.audio_player.refresh_library()
+        logger.info("Music library refreshed")
+
+    # Command type -> handler, looked up once per command in handle_command()
+    COMMAND_HANDLERS = {
+        'play_music': _handle_play_music,
+        'stop_music': _handle_stop_music,
+        'play_playlist': _handle_play_playlist,
+        'play_youtube_search': _handle_play_youtube_search,
+        'play_youtube_url': _handle_play_youtube_url,
+        'play_youtube_playlist': _handle_play_youtube_playlist,
+        'volume': _handle_volume,
+        'refresh_library': _handle_refresh_library,
+    }
@@ -2,7 +2,9 @@ from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 import asyncio
 import logging
-from typing import Optional
+import time
+import uuid
+from typing import Any, Dict, Optional
 from ..modules.tts_engine import TTSEngine
 from ..config.settings import Settings
 
@@ -20,30 +22,43 @@ class WebhookService:
         self.tts_engine = tts_engine
         self.settings = settings
         self.hc3_listener = hc3_listener
+        
+        # Outbound event notifications, coalesced into batches by _batch_flusher
+        self.event_url = settings.get('webhook.event_url', '')
+        self.batch_window = settings.get('webhook.batch_window_ms', 200) / 1000
+        self.batch_max = max(1, settings.get('webhook.batch_max', 50))
+        self._out_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.get('webhook.event_queue_size', 1000))
+        self._flusher_task = None
+        
+        # TTS requests are accepted immediately and spoken in order by _tts_worker
+        self._tts_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.get('webhook.tts_queue_size', 32))
+        self._tts_worker_task = None
+        
         self.setup_routes()
         
     def setup_routes(self):
         """Setup API endpoints"""
         
-        @self.app.post("/tts")
+        @self.app.post("/tts", status_code=202)
         async def text_to_speech(request: TTSRequest):
-            """API endpoint to receive text and convert to speech"""
+            """API endpoint to receive text and queue it for speech"""
             try:
                 if not request.text or request.text.strip() == "":
                     raise HTTPException(status_code=400, detail="Text cannot be empty")
                 
                 logger.info(f"Received TTS request: {request.text}")
                 
-                # Convert text to speech and play
-                await self.tts_engine.speak(
-                    text=request.text,
-                    voice=request.voice,
-                    speed=request.speed,
-                    volume=request.volume
-                )
+                # Respond right away; playback happens in the TTS worker
+                request_id = uuid.uuid4().hex
+                try:
+                    self._tts_queue.put_nowait((request_id, request))
+                except asyncio.QueueFull:
+                    raise HTTPException(status_code=429, detail="TTS queue is full")
                 
-                return {"status": "success", "message": "Text converted to speech successfully"}
+                return {"status": "queued", "id": request_id}
                 
+            except HTTPException:
+                raise
             except Exception as e:
                 logger.error(f"Error in TTS request: {e}")
                 raise HTTPException(status_code=500, detail=str(e))
@@ -61,6 +76,7 @@ class WebhookService:
                 
                 if self.hc3_listener:
                     await self.hc3_listener.handle_command(command)
+                    self.publish_event({"type": "hc3_command", "command": command})
                     return {"status": "success", "message": "Command processed"}
                 else:
                     raise HTTPException(status_code=503, detail="HC3 listener not available")
@@ -79,12 +95,74 @@ class WebhookService:
                 "endpoints": ["/tts", "/hc3/command", "/health", "/status"]
             }
     
+    def publish_event(self, event: Dict[str, Any]):
+        """Queue an event for delivery to the configured event URL"""
+        if not self.event_url:
+            return
+        event.setdefault("timestamp", time.time())
+        try:
+            self._out_queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Event URL is down or too slow, drop rather than grow without bound
+            logger.warning(f"Event queue full, dropping {event.get('type', 'event')}")
+    
+    async def _tts_worker(self):
+        """Speak queued TTS requests one at a time"""
+        while True:
+            request_id, request = await self._tts_queue.get()
+            try:
+                success = await self.tts_engine.speak(
+                    text=request.text,
+                    voice=request.voice,
+                    speed=request.speed,
+                    volume=request.volume
+                )
+                self.publish_event({"type": "tts", "id": request_id, "text": request.text, "success": success})
+            except Exception as e:
+                logger.error(f"Error speaking TTS request {request_id}: {e}")
+            finally:
+                self._tts_queue.task_done()
+    
+    async def _batch_flusher(self):
+        """Deliver queued events, coalescing those arriving within the batch window"""
+        import httpx
+        
+        loop = asyncio.get_running_loop()
+        timeout = self.settings.get('webhook.timeout', 60)
+        
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            while True:
+                events = [await self._out_queue.get()]
+                
+                deadline = loop.time() + self.batch_window
+                while len(events) < self.batch_max:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        events.append(await asyncio.wait_for(self._out_queue.get(), timeout=remaining))
+                    except asyncio.TimeoutError:
+                        break
+                
+                # Single-event mode posts the bare event
+                payload = events[0] if self.batch_max == 1 else {"events": events}
+                try:
+                    response = await client.post(self.event_url, json=payload)
+                    response.raise_for_status()
+                except Exception as e:
+                    # A failed batch is dropped, the flusher keeps serving later events
+                    logger.error(f"Error delivering {len(events)} webhook events: {e}")
+    
     async def start(self, host: str = "0.0.0.0", port: int = 8000):
         """Start webhook service"""
         try:
             import uvicorn
             logger.info(f"Starting webhook service on {host}:{port}")
             
+            self._tts_worker_task = asyncio.create_task(self._tts_worker())
+            if self.event_url:
+                self._flusher_task = asyncio.create_task(self._batch_flusher())
+            
             config = uvicorn.Config(
                 app=self.app,
                 host=host,
@@ -97,7 +175,16 @@ class WebhookService:
         except Exception as e:
             logger.error(f"Error starting webhook service: {e}")
             raise
+        finally:
+            self._cancel_tasks()
+    
+    def _cancel_tasks(self):
+        """Cancel the background TTS worker and event flusher"""
+        for task in (self._tts_worker_task, self._flusher_task):
+            if task:
+                task.cancel()
     
     def stop(self):
         """Stop webhook service"""
+        self._cancel_tasks()
         logger.info("Webhook service stopped")
\ No newline at end of file
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Quantize the Stylish-TTS ONNX model to INT8 with static per-channel calibration.
+
+Produces stylish-tts/stylish_1.int8.onnx, which TTSEngine loads in preference
+to the FP32 model. Static QInt8/QDQ quantization is used on purpose: dynamic
+QUInt8 quantization is much slower than FP32 on CPU for this kind of model.
+"""
+import argparse
+import logging
+import sys
+import tempfile
+from pathlib import Path
+
+import onnx
+from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+from mediacenter.modules.tts_engine import TTSEngine
+
+MODEL_DIR = Path(__file__).parent / "stylish-tts"
+
+# Calibration prompts, used when no --prompts file is given
+DEFAULT_PROMPTS = [
+    "Xin chào, chào mừng bạn về nhà.",
+    "Hôm nay trời nắng đẹp, nhiệt độ khoảng hai mươi tám độ.",
+    "Cửa chính đã được khóa.",
+    "Đèn phòng khách đã tắt.",
+    "Bây giờ là bảy giờ sáng, đã đến giờ thức dậy.",
+    "Có người đang đứng trước cửa nhà.",
+    "Nhiệt độ phòng ngủ hiện tại là hai mươi lăm độ.",
+    "Máy giặt đã hoàn thành chu trình giặt.",
+    "Cảnh báo, phát hiện rò rỉ nước trong nhà bếp.",
+    "Chúc bạn ngủ ngon.",
+    "Đang phát danh sách nhạc yêu thích của bạn.",
+    "Điều hòa đã được bật ở chế độ làm mát.",
+]
+
+class StylishCalibrationReader(CalibrationDataReader):
+    """Feed real prompts through the same text pipeline used for synthesis"""
+
+    def __init__(self, engine: TTSEngine, prompts):
+        self._inputs = iter([
+            dict(zip(("texts", "text_lengths"), engine._prepare_inputs(prompt)))
+            for prompt in prompts
+        ])
+
+    def get_next(self):
+        return next(self._inputs, None)
+
+def quantize(model_path: Path, output_path: Path, prompts):
+    """Run shape pre-processing, static quantization, and carry over model metadata"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = TTSEngine(cache_dir=tmp_dir)
+        if not engine.text_cleaner:
+            raise RuntimeError("Stylish-TTS could not be initialized, see log for details")
+
+        preprocessed_path = Path(tmp_dir) / "preprocessed.onnx"
+        quant_pre_process(str(model_path), str(preprocessed_path))
+
+        quantize_static(
+            str(preprocessed_path),
+            str(output_path),
+            StylishCalibrationReader(engine, prompts),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            op_types_to_quantize=["MatMul", "Conv"],
+            extra_options={"ActivationSymmetric": True, "WeightSymmetric": True}
+        )
+
+    # TTSEngine reads model_config from the ONNX metadata
+    source = onnx.load(str(model_path), load_external_data=False)
+    quantized = onnx.load(str(output_path))
+    onnx.helper.set_model_props(quantized, {prop.key: prop.value for prop in source.metadata_props})
+    onnx.save(quantized, str(output_path))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", type=Path, default=MODEL_DIR / "stylish_1.onnx", help="FP32 model to quantize")
+    parser.add_argument("--output", type=Path, default=MODEL_DIR / "stylish_1.int8.onnx", help="Quantized model path")
+    parser.add_argument("--prompts", type=Path, help="Text file with one calibration prompt per line")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    prompts = DEFAULT_PROMPTS
+    if args.prompts:
+        prompts = [line.strip() for line in args.prompts.read_text(encoding='utf-8').splitlines() if line.strip()]
+
+    if not args.model.exists():
+        print(f"Model not found: {args.model}")
+        sys.exit(1)
+
+    quantize(args.model, args.output, prompts)
+    print(f"Quantized model written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -17,12 +17,8 @@ fi
 # Install Python dependencies for Stylish-TTS
 echo "Installing Python dependencies..."
 pip install --no-cache-dir \
-    torch \
-    torchaudio \
-    pydub \
     onnx \
     onnxruntime \
-    scipy \
     numpy \
     misaki \
     git+https://github.com/CodeLinkIO/Vietnamese-text-normalization.git@main